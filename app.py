@@ -1,15 +1,82 @@
 # app.py
 import streamlit as st
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 from standardizer import match_and_merge_two_datasets
 from rapidfuzz import process, fuzz
 import base64
+import io
 
 def get_base64_image(image_path):
     """Encodes an image to a Base64 string for direct HTML embedding."""
     with open(image_path, "rb") as image_file:
         return base64.b64encode(image_file.read()).decode()
 
+@st.cache_resource
+def _header_images():
+    """Encodes the header logo and flag once per process instead of on every rerun."""
+    return get_base64_image("assets/image_0879e9.png"), get_base64_image("assets/image_087aab.png")
+
+# Both uploads plus the previous pair, so swapping one file doesn't evict the other
+@st.cache_data(show_spinner=False, max_entries=4)
+def read_file(file_bytes, file_name):
+    """Reads an uploaded CSV or Excel file. Cached on the file contents so reruns skip parsing."""
+    if file_name.endswith('.csv'):
+        # Every column is read as text so the user's values round-trip unchanged in the
+        # downloads; only empty fields become missing. The header is read with the C
+        # parser, which also renames duplicate names to 'name.1', 'name.2', ...
+        columns = list(pd.read_csv(io.BytesIO(file_bytes), nrows=0).columns)
+        try:
+            table = pa_csv.read_csv(
+                io.BytesIO(file_bytes),
+                read_options=pa_csv.ReadOptions(column_names=columns, skip_rows=1),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types={col: pa.string() for col in columns},
+                    null_values=[""], strings_can_be_null=True
+                )
+            )
+            return table.to_pandas(types_mapper=pd.ArrowDtype)
+        except pa.ArrowInvalid:
+            # The pyarrow parser rejects ragged rows that the C parser pads with missing values
+            return pd.read_csv(
+                io.BytesIO(file_bytes), dtype=pd.ArrowDtype(pa.string()), keep_default_na=False, na_values=[""]
+            )
+    elif file_name.endswith('.xlsx'):
+        return pd.read_excel(io.BytesIO(file_bytes), engine="calamine", dtype_backend="pyarrow")
+    else:
+        return None
+
+@st.cache_data(show_spinner=False)
+def map_columns(columns, required_cols):
+    """Creates a mapping from internal keys to the user's column names."""
+    normalized_cols = [col.strip().lower() for col in columns]
+    col_mapping = {}
+    missing_cols = []
+    if not normalized_cols:
+        return col_mapping, list(required_cols)
+
+    # Score every required key against every column in one call
+    scores = process.cdist(required_cols, normalized_cols, scorer=fuzz.ratio, score_cutoff=85, dtype=np.uint8) # High threshold for column names
+    best_cols = scores.argmax(axis=1)
+    for req_col, req_scores, best_col in zip(required_cols, scores, best_cols):
+        if req_scores[best_col] > 0:
+            col_mapping[req_col] = columns[best_col]
+        else:
+            missing_cols.append(req_col)
+    return col_mapping, missing_cols
+
+def _hash_dataframe(df):
+    """Hashes every cell, index label and column name. Streamlit's default hash samples frames of 50,000+ rows."""
+    return (tuple(df.columns), pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+
+# Three downloads per result, for the current and the previous thresholds
+@st.cache_data(show_spinner=False, max_entries=6, hash_funcs={pd.DataFrame: _hash_dataframe})
+def df_to_csv_bytes(df):
+    """Encodes a dataframe as CSV bytes for download. Cached so reruns don't re-serialize unchanged results."""
+    return df.to_csv(index=False).encode('utf-8')
+
 def run_app():
     """Main function to run the Streamlit app for merging two datasets."""
 
@@ -19,8 +86,7 @@ def run_app():
         layout="wide"
     )
     # --- Header with Custom Styling ---
-    logo_base64 = get_base64_image("assets/image_0879e9.png")
-    flag_base64 = get_base64_image("assets/image_087aab.png")
+    logo_base64, flag_base64 = _header_images()
 
     st.markdown(f"""
 <div style="background: linear-gradient(to right, #004d40, #000000); padding: 10px; border-radius: 10px; margin-bottom: 20px; position: relative; color: white;">
@@ -72,42 +138,25 @@ def run_app():
         min_value=50, max_value=100, value=80,
         help="Controls the strictness of matching for 'Woreda' names."
     )
+    woreda_scorer_name = st.selectbox(
+        "Woreda Matching Method",
+        ["Character similarity", "Ignore word order"],
+        help="'Character similarity' is fastest. Use 'Ignore word order' if Woreda names list the same words in a different order."
+    )
+    woreda_scorer = fuzz.token_sort_ratio if woreda_scorer_name == "Ignore word order" else fuzz.ratio
     
     # --- Processing ---
     if uploaded_file1 and uploaded_file2:
         try:
-            # Function to read the correct file format
-            def read_file(file):
-                if file.name.endswith('.csv'):
-                    return pd.read_csv(file)
-                elif file.name.endswith('.xlsx'):
-                    return pd.read_excel(file)
-                else:
-                    return None
-
-            df1 = read_file(uploaded_file1)
-            df2 = read_file(uploaded_file2)
+            df1 = read_file(uploaded_file1.getvalue(), uploaded_file1.name)
+            df2 = read_file(uploaded_file2.getvalue(), uploaded_file2.name)
             
             # These are the required column names for our internal logic
             required_key_columns = ['region', 'zone', 'woreda']
 
-            # Function to create a mapping from internal keys to user's column names
-            def map_columns(df, required_cols):
-                normalized_cols = [col.strip().lower() for col in df.columns]
-                col_mapping = {}
-                missing_cols = []
-                for req_col in required_cols:
-                    best_match = process.extractOne(req_col, normalized_cols, scorer=fuzz.ratio)
-                    if best_match and best_match[1] >= 85: # High threshold for column names
-                        matched_col = df.columns[normalized_cols.index(best_match[0])]
-                        col_mapping[req_col] = matched_col
-                    else:
-                        missing_cols.append(req_col)
-                return col_mapping, missing_cols
-
             # Get column mappings for both dataframes
-            col_mapping1, missing1 = map_columns(df1, required_key_columns)
-            col_mapping2, missing2 = map_columns(df2, required_key_columns)
+            col_mapping1, missing1 = map_columns(list(df1.columns), required_key_columns)
+            col_mapping2, missing2 = map_columns(list(df2.columns), required_key_columns)
             
             if missing1 or missing2:
                 if missing1:
@@ -115,12 +164,11 @@ def run_app():
                 if missing2:
                     st.error(f"Dataset 2 is missing the following required columns or a good match could not be found: **{', '.join(missing2)}**")
             else:
-                st.info("🔄 Processing and merging your data...")
-
                 # Call the core matching function with the new thresholds
-                merged_df, unmatched_df1, unmatched_df2 = match_and_merge_two_datasets(
-                    df1, df2, col_mapping1, col_mapping2, region_threshold, zone_threshold, woreda_threshold
-                )
+                with st.spinner("🔄 Processing and merging your data..."):
+                    merged_df, unmatched_df1, unmatched_df2 = match_and_merge_two_datasets(
+                        df1, df2, col_mapping1, col_mapping2, region_threshold, zone_threshold, woreda_threshold, woreda_scorer
+                    )
 
                 st.success("✅ Datasets merged successfully!")
 
@@ -129,7 +177,7 @@ def run_app():
                 st.dataframe(merged_df)
                 st.download_button(
                     "⬇️ Download Merged Data (.csv)",
-                    merged_df.to_csv(index=False).encode('utf-8'),
+                    df_to_csv_bytes(merged_df),
                     "merged_data.csv",
                     "text/csv"
                 )
@@ -140,7 +188,7 @@ def run_app():
                     st.dataframe(unmatched_df1)
                     st.download_button(
                         "⬇️ Download Unmatched Rows from Dataset 1",
-                        unmatched_df1.to_csv(index=False).encode('utf-8'),
+                        df_to_csv_bytes(unmatched_df1),
                         "unmatched_dataset1.csv",
                         "text/csv"
                     )
@@ -151,7 +199,7 @@ def run_app():
                     st.dataframe(unmatched_df2)
                     st.download_button(
                         "⬇️ Download Unmatched Rows from Dataset 2",
-                        unmatched_df2.to_csv(index=False).encode('utf-8'),
+                        df_to_csv_bytes(unmatched_df2),
                         "unmatched_dataset2.csv",
                         "text/csv"
                     )
@@ -1,5 +1,12 @@
 # standardizer.py
+import sys
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from rapidfuzz import process, fuzz
 # ... (other imports)
 import streamlit as st
@@ -13,7 +20,33 @@ def match_and_merge_two_datasets(df1, df2, col_mapping1, col_mapping2, region_th
     # ... (your existing code)
     # The rest of your function remains the same
 
-def match_and_merge_two_datasets(df1, df2, col_mapping1, col_mapping2, region_threshold, zone_threshold, woreda_threshold):
+def _normalize_key(series):
+    """Trims and lowercases a key column with Arrow compute kernels. Missing values become empty strings."""
+    if not (isinstance(series.dtype, pd.ArrowDtype) and pa.types.is_string(series.dtype.pyarrow_dtype)):
+        series = series.astype(str).astype(pd.ArrowDtype(pa.string()))
+    values = pa.array(series.array)
+    normalized = pc.utf8_lower(pc.utf8_trim_whitespace(pc.fill_null(values, "")))
+    return pd.Series(pd.arrays.ArrowExtensionArray(normalized), index=series.index, name=series.name)
+
+def _optimal_assign(scores, codes1, codes2, key_scores):
+    """
+    Finds the one-to-one assignment of rows to columns with the highest combined score.
+    Rows and columns look up their Woreda score through codes1 and codes2, and key_scores
+    holds each pair's Region plus Zone score, or -1 where Region or Zone fails its
+    threshold. Only pairs that pass all three thresholds can be matched.
+
+    Returns:
+        ndarray: Matched row positions.
+        ndarray: Matched column positions.
+    """
+    woreda_scores = scores[np.ix_(codes1, codes2)]
+    mask = (woreda_scores > 0) & (key_scores >= 0)
+    combined = np.where(mask, key_scores + woreda_scores, -1)
+    rows, cols = linear_sum_assignment(combined, maximize=True)
+    keep = mask[rows, cols]
+    return rows[keep], cols[keep]
+
+def match_and_merge_two_datasets(df1, df2, col_mapping1, col_mapping2, region_threshold, zone_threshold, woreda_threshold, woreda_scorer=fuzz.ratio):
     """
     Fuzzy matches and merges two datasets based on a list of key columns.
     
@@ -25,6 +58,8 @@ def match_and_merge_two_datasets(df1, df2, col_mapping1, col_mapping2, region_th
         region_threshold (int): Match score threshold for Region.
         zone_threshold (int): Match score threshold for Zone.
         woreda_threshold (int): Match score threshold for Woreda.
+        woreda_scorer (callable): RapidFuzz scorer for Woreda names. Defaults to fuzz.ratio;
+            use fuzz.token_sort_ratio when words may appear in a different order.
 
     Returns:
         DataFrame: A merged dataframe with all columns from both inputs.
@@ -36,61 +71,124 @@ def match_and_merge_two_datasets(df1, df2, col_mapping1, col_mapping2, region_th
     df2_copy = df2.copy()
     
     # Standardize column names based on the provided mapping
-    for req_col, actual_col in col_mapping1.items():
-        if actual_col != req_col:
-            df1_copy.rename(columns={actual_col: req_col}, inplace=True)
-            df1_copy[req_col] = df1_copy[req_col].astype(str).str.strip().str.lower()
-            
-    for req_col, actual_col in col_mapping2.items():
-        if actual_col != req_col:
-            df2_copy.rename(columns={actual_col: req_col}, inplace=True)
-            df2_copy[req_col] = df2_copy[req_col].astype(str).str.strip().str.lower()
+    df1_copy.rename(columns={actual_col: req_col for req_col, actual_col in col_mapping1.items()}, inplace=True)
+    df2_copy.rename(columns={actual_col: req_col for req_col, actual_col in col_mapping2.items()}, inplace=True)
     
     # Define the key columns and non-key columns from df2 to be merged
     key_cols = list(col_mapping1.keys())
     df2_non_key_cols = [col for col in df2.columns if col not in col_mapping2.values()]
+
+    # Normalize the key columns once, whether or not they were renamed
+    for col in key_cols:
+        df1_copy[col] = _normalize_key(df1_copy[col])
+        df2_copy[col] = _normalize_key(df2_copy[col])
     
     # Prepare for merging and tracking unmatched rows
-    matched_rows = []
-    unmatched_df1_rows = []
-    matched_indices_df2 = set()
-    
-    # Iterate through df1 and find matches in df2
-    for index1, row1 in df1_copy.iterrows():
-        found_match = False
-        
-        # Iterate through df2 to find a match for the current row from df1
-        for index2, row2 in df2_copy.iterrows():
-            if index2 in matched_indices_df2:
-                continue # Skip if this row from df2 is already matched
-                
-            region_score = fuzz.ratio(str(row1['region']), str(row2['region']))
-            zone_score = fuzz.ratio(str(row1['zone']), str(row2['zone']))
-            woreda_score = fuzz.token_set_ratio(str(row1['woreda']), str(row2['woreda']))
-
-            if (region_score >= region_threshold and 
-                zone_score >= zone_threshold and 
-                woreda_score >= woreda_threshold):
-                
-                # A match is found, prepare the combined row
-                combined_row = df1.iloc[index1].to_dict()
-                
-                # Add only the non-key columns from df2 to the combined row
-                for col in df2_non_key_cols:
-                    combined_row[col] = df2.iloc[index2][col]
-                    
-                matched_rows.append(combined_row)
-                matched_indices_df2.add(index2)
-                found_match = True
-                break # Move to the next row in df1
-        
-        if not found_match:
-            unmatched_df1_rows.append(df1.iloc[index1].to_dict())
-
-    merged_df = pd.DataFrame(matched_rows)
-    unmatched_df1 = pd.DataFrame(unmatched_df1_rows)
-
-    unmatched_indices_df2 = [i for i in range(len(df2)) if i not in matched_indices_df2]
-    unmatched_df2 = df2.iloc[unmatched_indices_df2]
+    matched_pairs1 = []
+    matched_pairs2 = []
+
+    # Rows whose normalized keys are identical in both datasets are matched with
+    # a hash join first. Numbering repeated keys on each side pairs them one-to-one.
+    keys1 = df1_copy[key_cols].assign(_n=df1_copy.groupby(key_cols, sort=False).cumcount(), _i=np.arange(len(df1_copy)))
+    keys2 = df2_copy[key_cols].assign(_n=df2_copy.groupby(key_cols, sort=False).cumcount(), _j=np.arange(len(df2_copy)))
+    exact = keys1.merge(keys2, on=key_cols + ['_n'], how='inner')
+    matched_pairs1.append(exact['_i'].to_numpy(dtype=np.intp))
+    matched_pairs2.append(exact['_j'].to_numpy(dtype=np.intp))
+
+    exact_mask1 = np.zeros(len(df1_copy), dtype=bool)
+    exact_mask1[matched_pairs1[0]] = True
+    exact_mask2 = np.zeros(len(df2_copy), dtype=bool)
+    exact_mask2[matched_pairs2[0]] = True
+
+    # Region and Zone only take a few distinct values. Store them as categoricals
+    # sharing one category set and score every pair of categories once instead
+    # of scoring the names on every row pair.
+    category_scores = {}
+    for col, threshold in (('region', region_threshold), ('zone', zone_threshold)):
+        categories = pd.Index(np.union1d(df1_copy[col].unique(), df2_copy[col].unique()))
+        df1_copy[col] = pd.Categorical(df1_copy[col], categories=categories)
+        df2_copy[col] = pd.Categorical(df2_copy[col], categories=categories)
+        category_scores[col] = process.cdist(
+            categories.tolist(), categories.tolist(),
+            scorer=fuzz.ratio, score_cutoff=threshold, workers=-1, dtype=np.uint8
+        ).astype(np.int32)
+
+    # Group the remaining rows of each dataset by their Region/Zone codes
+    residual1 = np.flatnonzero(~exact_mask1)
+    residual2 = np.flatnonzero(~exact_mask2)
+    groups1 = pd.DataFrame({
+        'region': df1_copy['region'].cat.codes.to_numpy()[residual1],
+        'zone': df1_copy['zone'].cat.codes.to_numpy()[residual1],
+    }).groupby(['region', 'zone'], sort=False).indices
+    groups2 = pd.DataFrame({
+        'region': df2_copy['region'].cat.codes.to_numpy()[residual2],
+        'zone': df2_copy['zone'].cat.codes.to_numpy()[residual2],
+    }).groupby(['region', 'zone'], sort=False).indices
+    group_keys1 = np.array(list(groups1.keys()), dtype=np.intp).reshape(-1, 2)
+    group_keys2 = np.array(list(groups2.keys()), dtype=np.intp).reshape(-1, 2)
+    group_rows1 = [residual1[positions] for positions in groups1.values()]
+    group_rows2 = [residual2[positions] for positions in groups2.values()]
+
+    # A df1 group is linked to every df2 group whose Region and Zone both pass their
+    # thresholds, so spelling variants on either side still meet. Linked groups form
+    # connected blocks that are matched together.
+    region_scores = category_scores['region'][np.ix_(group_keys1[:, 0], group_keys2[:, 0])]
+    zone_scores = category_scores['zone'][np.ix_(group_keys1[:, 1], group_keys2[:, 1])]
+    linked = (region_scores > 0) & (zone_scores > 0)
+    key_scores = np.where(linked, region_scores + zone_scores, -1)
+    link1, link2 = np.nonzero(linked)
+    n_groups1 = len(group_rows1)
+    n_groups = n_groups1 + len(group_rows2)
+    graph = coo_matrix((np.ones(len(link1)), (link1, link2 + n_groups1)), shape=(n_groups, n_groups))
+    n_blocks, block_labels = connected_components(graph, directed=False)
+
+    # Fuzzy-match the remaining Woreda names only within each block
+    for block in range(n_blocks):
+        block_groups1 = np.flatnonzero(block_labels[:n_groups1] == block)
+        block_groups2 = np.flatnonzero(block_labels[n_groups1:] == block)
+        if not len(block_groups1) or not len(block_groups2):
+            continue
+
+        block1 = np.concatenate([group_rows1[g] for g in block_groups1])
+        block2 = np.concatenate([group_rows2[g] for g in block_groups2])
+        row_groups = np.repeat(block_groups1, [len(group_rows1[g]) for g in block_groups1])
+        col_groups = np.repeat(block_groups2, [len(group_rows2[g]) for g in block_groups2])
+
+        # Facility tables repeat the same Woreda on many rows, so score each
+        # distinct name once and look rows up through their factorized codes.
+        # Pairs below the threshold come back as 0.
+        codes1, woredas1 = pd.factorize(df1_copy['woreda'].iloc[block1])
+        codes2, woredas2 = pd.factorize(df2_copy['woreda'].iloc[block2])
+        woreda_scores = process.cdist(
+            [sys.intern(woreda) for woreda in woredas1], [sys.intern(woreda) for woreda in woredas2],
+            scorer=woreda_scorer, score_cutoff=woreda_threshold, workers=-1, dtype=np.uint8
+        )
+
+        # Pick the pairing of rows from df1 and df2 with the best total score
+        i_pos, j_pos = _optimal_assign(woreda_scores, codes1, codes2, key_scores[np.ix_(row_groups, col_groups)])
+        matched_pairs1.append(block1[i_pos])
+        matched_pairs2.append(block2[j_pos])
+
+    # Assemble the merged frame column-wise from the matched row positions
+    i_idx = np.concatenate(matched_pairs1 + [np.empty(0, dtype=np.intp)])
+    j_idx = np.concatenate(matched_pairs2 + [np.empty(0, dtype=np.intp)])
+    order = np.argsort(i_idx)
+    i_idx = i_idx[order]
+    j_idx = j_idx[order]
+    # Rows and columns are taken in a single iloc per side, without an intermediate column subset.
+    # A non-key column present in both datasets keeps df1's position and takes df2's values.
+    left_cols = [k for k, col in enumerate(df1.columns) if col not in df2_non_key_cols]
+    right_cols = [k for k, col in enumerate(df2.columns) if col in df2_non_key_cols]
+    left = df1.iloc[i_idx, left_cols].reset_index(drop=True)
+    right = df2.iloc[j_idx, right_cols].reset_index(drop=True)
+    merged_cols = list(df1.columns) + [col for col in df2_non_key_cols if col not in df1.columns]
+    merged_df = pd.concat([left, right], axis=1)[merged_cols]
+
+    matched_mask1 = np.zeros(len(df1), dtype=bool)
+    matched_mask1[i_idx] = True
+    matched_mask2 = np.zeros(len(df2), dtype=bool)
+    matched_mask2[j_idx] = True
+    unmatched_df1 = df1.iloc[~matched_mask1].reset_index(drop=True)
+    unmatched_df2 = df2.iloc[~matched_mask2]
 
     return merged_df, unmatched_df1, unmatched_df2
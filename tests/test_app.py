@@ -0,0 +1,33 @@
+import pandas as pd
+
+from app import df_to_csv_bytes, read_file
+
+
+def test_read_csv_pads_ragged_rows():
+    df = read_file(b'a,b\n1,2\n3\n', 'data.csv')
+
+    assert df.shape == (2, 2)
+    assert df['b'].isna().tolist() == [False, True]
+
+
+def test_read_csv_dedupes_repeated_headers():
+    df = read_file(b'woreda,woreda,zone\n1,2,3\n', 'data.csv')
+
+    assert list(df.columns) == ['woreda', 'woreda.1', 'zone']
+
+
+def test_read_csv_round_trips_values_unchanged():
+    data = b'id,visit,big,rate,note\n1,2023-01-05 10:00,12345678901234567890,1.50,NA\n2,,3,,x\n'
+    ragged = data + b'3\n'
+
+    assert read_file(data, 'data.csv').to_csv(index=False).encode() == data
+    assert read_file(ragged, 'data.csv').to_csv(index=False).encode() == data + b'3,,,,\n'
+
+
+def test_csv_bytes_cache_sees_single_cell_change_in_large_frame():
+    df = pd.DataFrame({'woreda': [f'w{i}' for i in range(60_000)], 'penta1': range(60_000)})
+    changed = df.copy()
+    changed.loc[30_000, 'penta1'] = -1
+
+    assert df_to_csv_bytes(df) != df_to_csv_bytes(changed)
+    assert b'w30000,-1\n' in df_to_csv_bytes(changed)
@@ -0,0 +1,70 @@
+import pandas as pd
+
+from standardizer import match_and_merge_two_datasets
+
+KEYS = {'region': 'region', 'zone': 'zone', 'woreda': 'woreda'}
+
+
+def merge(df1, df2, threshold=80):
+    return match_and_merge_two_datasets(df1, df2, KEYS, KEYS, threshold, threshold, threshold)
+
+
+def test_region_spelling_variants_in_df2_still_match():
+    df1 = pd.DataFrame({
+        'region': ['Oromia', 'Oromia'],
+        'zone': ['Arsi', 'Arsi'],
+        'woreda': ['Tiyo', 'Hetosa'],
+    })
+    df2 = pd.DataFrame({
+        'region': ['Oromia', 'Oromiya'],
+        'zone': ['Arsi', 'Arsi'],
+        'woreda': ['Tiyo', 'Hetosa'],
+        'penta1': [1, 2],
+    })
+
+    merged_df, unmatched_df1, unmatched_df2 = merge(df1, df2)
+
+    assert [len(merged_df), len(unmatched_df1), len(unmatched_df2)] == [2, 0, 0]
+    assert merged_df['penta1'].tolist() == [1, 2]
+
+
+def test_zone_must_match_within_the_same_region():
+    df1 = pd.DataFrame({'region': ['Amhara'], 'zone': ['West Gojam'], 'woreda': ['Bure']})
+    df2 = pd.DataFrame({
+        'region': ['Oromia', 'Amhara'],
+        'zone': ['West Gojam', 'West Gojjam'],
+        'woreda': ['Bure', 'Bure'],
+        'penta1': [1, 2],
+    })
+
+    merged_df, unmatched_df1, unmatched_df2 = merge(df1, df2)
+
+    assert merged_df['penta1'].tolist() == [2]
+    assert unmatched_df2['penta1'].tolist() == [1]
+
+
+def test_no_rows():
+    df = pd.DataFrame({'region': ['a'], 'zone': ['b'], 'woreda': ['c']})
+
+    merged_df, unmatched_df1, unmatched_df2 = merge(df, df.iloc[:0])
+
+    assert [len(merged_df), len(unmatched_df1), len(unmatched_df2)] == [0, 1, 0]
+
+
+def test_shared_column_keeps_df1_position_with_df2_values():
+    df1 = pd.DataFrame({'region': ['a'], 'population': [10], 'zone': ['b'], 'woreda': ['c']})
+    df2 = pd.DataFrame({'region': ['a'], 'zone': ['b'], 'woreda': ['c'], 'population': [20], 'penta1': [5]})
+
+    merged_df, _, _ = merge(df1, df2)
+
+    assert list(merged_df.columns) == ['region', 'population', 'zone', 'woreda', 'penta1']
+    assert merged_df['population'].tolist() == [20]
+
+
+def test_one_substitution_without_shared_trigram_still_matches():
+    df1 = pd.DataFrame({'region': ['afar', 'x'], 'zone': ['awsi', 'y'], 'woreda': ['Dubti', 'abcde']})
+    df2 = pd.DataFrame({'region': ['afar', 'x'], 'zone': ['awsi', 'y'], 'woreda': ['Dupti', 'abxde']})
+
+    merged_df, unmatched_df1, unmatched_df2 = merge(df1, df2)
+
+    assert [len(merged_df), len(unmatched_df1), len(unmatched_df2)] == [2, 0, 0]